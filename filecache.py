@@ -25,6 +25,8 @@ file handle, but will benefit from a shared cache:
     fh.readline()
     fh.seek(500)
     fh.read()
+    fh.seek(0)
+    fh.readinto(buffer)
     fh.readlines()
     fh.close()
 
@@ -110,7 +112,7 @@ class lazy_file_cache(object):
         with self._file_lock:
             read_bytes = position - self._cache_size
             # This looks like an unnecessary check, but required for concurrency
-            if read_bytes <= 0:
+            if self._all_cached or read_bytes <= 0:
                 return
 
             # Do not read less than a memory page, round up read size to a
@@ -122,13 +124,10 @@ class lazy_file_cache(object):
 
             expected_cache_size = self._cache_size + read_bytes
 
-            data = self._file.read(read_bytes)
-            self._cache_object.seek(self._cache_size)
-            self._cache_object.write(data)
-            self._cache_size = self._cache_object.tell()
+            data_size = self._read_into_cache(read_bytes)
 
             self._debug(
-                "Read %d bytes from file, cache size %d" % (len(data), self._cache_size)
+                "Read %d bytes from file, cache size %d" % (data_size, self._cache_size)
             )
 
             if expected_cache_size != self._cache_size:
@@ -162,11 +161,8 @@ class lazy_file_cache(object):
 
             self._debug("Reading remaining file into cache")
 
-            data = self._file.read(self._cache_limit - self._cache_size)
-            self._cache_object.seek(self._cache_size)
-            self._cache_object.write(data)
-            self._debug("Read %d bytes" % len(data))
-            self._cache_size += len(data)
+            data_size = self._read_into_cache(self._cache_limit - self._cache_size)
+            self._debug("Read %d bytes" % data_size)
 
             if self._cache_size >= self._cache_limit:
                 # Don't cache more than the set limit. In this case keep file handler
@@ -178,6 +174,47 @@ class lazy_file_cache(object):
             self._all_cached = True
             self._close_file()
 
+    def _read_into_cache(self, read_bytes):
+        """Read up to read_bytes bytes from the file and append them to the cache.
+        Must be called with the file lock held. Returns the number of bytes read."""
+        initial_size = self._cache_size
+        target_size = initial_size + read_bytes
+        while self._cache_size < target_size:
+            chunk_size = self._read_chunk_size(target_size)
+            data = self._file.read(chunk_size)
+            if self._cache_size == 0:
+                # A BytesIO shares the buffer of its initial value, so the first
+                # read need not be copied
+                self._cache_object = io.BytesIO(data)
+            else:
+                self._cache_object.seek(self._cache_size)
+                self._cache_object.write(data)
+            self._cache_size += len(data)
+            if len(data) < chunk_size:
+                # Reached end of file
+                break
+        return self._cache_size - initial_size
+
+    def _read_chunk_size(self, target_size):
+        """Return the number of bytes to read from the file next, when filling the
+        cache up to target_size. Large reads are not requested in one go, as the
+        file object allocates space for the full request. They are limited to
+        just beyond the end of the file if its size is known, and otherwise
+        grow geometrically."""
+        chunk_size = target_size - self._cache_size
+        if chunk_size <= self._page_size:
+            return chunk_size
+        try:
+            # One more byte than the file size, so that the end of the file is
+            # detected by a short read without a further read call
+            file_size = os.fstat(self._file.fileno()).st_size + 1
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            file_size = 0
+        return min(
+            chunk_size,
+            max(self._page_size, self._cache_size, file_size - self._cache_size),
+        )
+
     def _check_not_closed(self):
         if self._closed:
             self._debug("Instance tried to access closed cache")
@@ -237,26 +274,28 @@ class lazy_file_cache(object):
             if self._closing and (self._reference_counter == 0):
                 self.force_close()
 
+    def _passthrough(self, start, maxbytes=None):
+        """Ensure that relevant data is in cache for a read from position start
+        of up to maxbytes bytes, or the entire file if maxbytes is not set.
+        Returns True if the read needs to be passed to the underlying file."""
+        if self._all_cached:
+            return False
+        if maxbytes is None:
+            self._cache_all()
+            return not self._all_cached
+        self._cache_up_to(start + maxbytes)
+        if self._all_cached:
+            # Reaching the end of the file may also have reached the cache limit,
+            # but the file is closed by then and the cache holds all of it
+            return False
+        return self._cache_limit_reached and start + maxbytes > self._cache_size
+
     def pass_read(self, start=0, maxbytes=None):
         """Read from position start up to maxbytes bytes from file.
         If maxbytes is not set, read the entire file."""
         self._check_not_closed()
 
-        # Do we need to pass the read request to the underlying file object?
-        passthrough = False
-
-        if not self._all_cached:
-            # Ensure that relevant data is in cache
-            if maxbytes is None:
-                self._cache_all()
-                if not self._all_cached:
-                    passthrough = True
-            else:
-                self._cache_up_to(start + maxbytes)
-                if self._cache_limit_reached:
-                    passthrough = start + maxbytes > self._cache_size
-
-        if passthrough:
+        if self._passthrough(start, maxbytes):
             with self._file_lock:
                 self._file.seek(start)
                 if maxbytes is None:
@@ -268,34 +307,61 @@ class lazy_file_cache(object):
                         % (start, start + maxbytes - 1)
                     )
                     return self._file.read(maxbytes), self._file.tell()
+
+        cache = self._cache_object
+        cache.seek(start)
+        if maxbytes is None:
+            return cache.read(), cache.tell()
         else:
-            self._cache_object.seek(start)
-            if maxbytes is None:
-                return self._cache_object.read(), self._cache_object.tell()
-            else:
-                return self._cache_object.read(maxbytes), self._cache_object.tell()
+            return cache.read(maxbytes), cache.tell()
+
+    def pass_readinto(self, buffer, start=0):
+        """Read from position start into a pre-allocated, writable buffer,
+        without creating an intermediate copy of the data.
+        Returns the number of bytes read."""
+        self._check_not_closed()
+
+        with memoryview(buffer) as raw_view, raw_view.cast("B") as view:
+            maxbytes = len(view)
+            if maxbytes == 0:
+                return 0
+
+            if self._passthrough(start, maxbytes):
+                with self._file_lock:
+                    self._debug(
+                        "Passing through readinto from %d to %d"
+                        % (start, start + maxbytes - 1)
+                    )
+                    self._file.seek(start)
+                    return self._file.readinto(view) or 0
+
+            cache = self._cache_object
+            cache.seek(start)
+            return cache.readinto(view)
 
     def pass_readline(self, start=0, maxbytes=None):
         """Read a line from file, but no more than maxbytes bytes."""
         self._check_not_closed()
 
+        cache = self._cache_object
         if self._all_cached:
-            self._cache_object.seek(start)
+            cache.seek(start)
             if maxbytes is None:
-                return self._cache_object.readline(), self._cache_object.tell()
+                return cache.readline(), cache.tell()
             else:
-                return self._cache_object.readline(maxbytes), self._cache_object.tell()
+                return cache.readline(maxbytes), cache.tell()
 
         if self._cache_size <= start:
             self._cache_up_to(start + self._page_size)
+            cache = self._cache_object
 
-        self._cache_object.seek(start)
+        cache.seek(start)
         if maxbytes is None:
-            line_candidate = self._cache_object.readline()
+            line_candidate = cache.readline()
         else:
-            line_candidate = self._cache_object.readline(maxbytes)
+            line_candidate = cache.readline(maxbytes)
 
-        end_position = self._cache_object.tell()
+        end_position = cache.tell()
 
         if end_position < self._cache_size or line_candidate.endswith(b"\n"):
             # Found a complete line within the cache
@@ -305,28 +371,39 @@ class lazy_file_cache(object):
             # Fulfilled maxbytes condition within the cache
             return line_candidate, end_position
 
-        # Need more data
-        while end_position == self._cache_size and not self._cache_limit_reached:
-            # Do we have a complete line?
-            if line_candidate.endswith(b"\n"):
-                return line_candidate, end_position
-
+        # Need more data. Collect the parts of the line and join them once
+        line_parts = [line_candidate]
+        while end_position == self._cache_size and not (
+            self._all_cached or self._cache_limit_reached
+        ):
             # Ran against cache limit. Extend cache
             self._cache_up_to(self._cache_size + self._page_size)
-            self._cache_object.seek(end_position)
+            cache = self._cache_object
+            cache.seek(end_position)
 
             # Continue reading
             if maxbytes is None:
-                line_candidate += self._cache_object.readline()
+                line_candidate = cache.readline()
             else:
                 foundbytes = end_position - start
-                line_candidate += self._cache_object.readline(maxbytes - foundbytes)
-            end_position = self._cache_object.tell()
+                line_candidate = cache.readline(maxbytes - foundbytes)
+            line_parts.append(line_candidate)
+            end_position = cache.tell()
+
+            # Do we have a complete line?
+            if line_candidate.endswith(b"\n"):
+                break
+
+        line_candidate = b"".join(line_parts)
 
         # Do we have a complete line?
         if line_candidate.endswith(b"\n") or self._all_cached:
             return line_candidate, end_position
 
+        if (maxbytes is not None) and (end_position == start + maxbytes):
+            # Fulfilled maxbytes condition within the cache
+            return line_candidate, end_position
+
         assert self._cache_limit_reached  # Only legitimate way of reaching here
 
         with self._file_lock:
@@ -406,6 +483,12 @@ class pseudo_file(object):
             data, self._seek = self._cache_object.pass_readline(start=self._seek)
         return data
 
+    def readinto(self, b):
+        self._check_not_closed()
+        size = self._cache_object.pass_readinto(b, start=self._seek)
+        self._seek += size
+        return size
+
     def readlines(self, sizehint=-1):
         self._check_not_closed()
         if sizehint > 0:
@@ -11,8 +11,7 @@ from scitbx import matrix
 
 from dxtbx.model.detector_helpers import (
     detector_helper_sensors,
-    find_gain_value,
-    find_undefined_value,
+    find_array_intensity_values,
     set_detector_distance,
     set_mosflm_beam_centre,
     set_slow_fast_beam_centre_mm,
@@ -735,14 +734,20 @@ class DetectorFactory(object):
         slow = cbf_detector.get_detector_axis_slow()
         size = tuple(reversed(cbf_handle.get_image_size(0)))
 
-        try:
-            underload = find_undefined_value(cbf_handle)
-            overload = cbf_handle.get_overload(0)
-            trusted_range = (underload, overload * dxtbx_overload_scale)
-        except Exception:
-            trusted_range = (0.0, 1.0e6)
+        intensity_values = find_array_intensity_values(cbf_handle)
 
-        gain = find_gain_value(cbf_handle)
+        trusted_range = (0.0, 1.0e6)
+        underload = intensity_values["undefined_value"]
+        if underload is not None:
+            try:
+                overload = cbf_handle.get_overload(0)
+                trusted_range = (underload, overload * dxtbx_overload_scale)
+            except Exception:
+                pass
+
+        gain = intensity_values["gain"]
+        if gain is None:
+            gain = 1.0
 
         cbf_detector.__swig_destroy__(cbf_detector)
         del cbf_detector
@@ -1,6 +1,5 @@
 from __future__ import absolute_import, division, print_function
 
-import itertools
 import math
 from builtins import object
 from operator import itemgetter
@@ -14,6 +13,9 @@ try:
 except ImportError:
     sklearn = None
 
+# Cosine of the obliquity above which a detector is assumed to be 2theta offset
+_COS_5DEG = math.cos(math.radians(5.0))
+
 
 def read_xds_xparm(xds_xparm_file):
     """Parse the XDS XPARM file, which contains a description of the detector
@@ -136,6 +138,37 @@ def find_gain_value(cbf_handle):
     return cbf_handle.get_doublevalue()
 
 
+def find_array_intensity_values(cbf_handle):
+    """Given a cbf handle, get the undefined pixel value and the gain from the
+    array_intensities category, finding the category only once. Returns a
+    dictionary with keys "undefined_value" and "gain". The undefined value is
+    None if it could not be read for any reason, and the gain is None if it is
+    not present in the file."""
+
+    values = {"undefined_value": None, "gain": None}
+    try:
+        cbf_handle.find_category(b"array_intensities")
+    except Exception as e:
+        if "CBF_NOTFOUND" not in str(e):
+            raise
+        return values
+
+    try:
+        cbf_handle.find_column(b"undefined_value")
+        values["undefined_value"] = cbf_handle.get_doublevalue()
+    except Exception:
+        pass
+
+    try:
+        cbf_handle.find_column(b"gain")
+    except Exception as e:
+        if "CBF_NOTFOUND" not in str(e):
+            raise
+    else:
+        values["gain"] = cbf_handle.get_doublevalue()
+    return values
+
+
 class detector_helper_sensors(object):
     """A helper class which allows enumeration of detector sensor technologies
     which should help in identifying specific detectors when needed. These are
@@ -146,24 +179,16 @@ class detector_helper_sensors(object):
     SENSOR_IMAGE_PLATE = "SENSOR_IMAGE_PLATE"
     SENSOR_UNKNOWN = "SENSOR_UNKNOWN"
 
+    _known_sensors = (SENSOR_CCD, SENSOR_PAD, SENSOR_IMAGE_PLATE)
+    _valid_sensors = frozenset(_known_sensors + (SENSOR_UNKNOWN,))
+
     @staticmethod
     def check_sensor(sensor_type):
-        if sensor_type in (
-            detector_helper_sensors.SENSOR_CCD,
-            detector_helper_sensors.SENSOR_PAD,
-            detector_helper_sensors.SENSOR_IMAGE_PLATE,
-            detector_helper_sensors.SENSOR_UNKNOWN,
-        ):
-            return True
-        return False
+        return sensor_type in detector_helper_sensors._valid_sensors
 
     @staticmethod
     def all():
-        return [
-            detector_helper_sensors.SENSOR_CCD,
-            detector_helper_sensors.SENSOR_PAD,
-            detector_helper_sensors.SENSOR_IMAGE_PLATE,
-        ]
+        return detector_helper_sensors._known_sensors
 
 
 def set_slow_fast_beam_centre_mm(detector, beam, beam_centre, panel_id=None):
@@ -187,36 +212,34 @@ def set_slow_fast_beam_centre_mm(detector, beam, beam_centre, panel_id=None):
     panel = detector[panel_id]
     n = matrix.col(panel.get_normal())
 
-    # Attempt to find the axis an angle of an applied 2theta shift
-    cos_angle = n.cos_angle(us0)
-    if cos_angle < 0:
-        axi = us0.cross(-n)
-        ang = us0.angle(-n)
-    else:
-        axi = us0.cross(n)
-        ang = us0.angle(n)
+    # Only multi-level detector models have a hierarchy
+    h = detector.hierarchy() if hasattr(detector, "hierarchy") else None
 
     # Assume a 2theta offset if obliquity >= 5 deg
-    two_theta = abs(ang) >= 5.0 * math.pi / 180.0
+    u = np.array(us0.elems)
+    v = np.array(n.elems)
+    cos_angle = np.dot(u, v) / (np.linalg.norm(u) * np.linalg.norm(v))
+    two_theta = abs(cos_angle) <= _COS_5DEG
 
     # Undo 2theta shift
     if two_theta:
-        R = axi.axis_and_angle_as_r3_rotation_matrix(ang)
+        # Find the axis and angle of the applied 2theta shift, using the
+        # direction of the normal closest to the beam. atan2 remains accurate
+        # for small angles, unlike acos.
+        if cos_angle < 0:
+            v = -v
+        axi = np.cross(u, v)
+        ang = math.atan2(np.linalg.norm(axi), np.dot(u, v))
+        R = matrix.col(axi.tolist()).axis_and_angle_as_r3_rotation_matrix(ang)
         Rinv = R.inverse()
-        try:
-            h = detector.hierarchy()
+        if h is not None:
             h.set_frame(
                 fast_axis=Rinv * matrix.col(h.get_fast_axis()),
                 slow_axis=Rinv * matrix.col(h.get_slow_axis()),
                 origin=Rinv * matrix.col(h.get_origin()),
             )
-        except AttributeError:
-            for p in detector:
-                p.set_frame(
-                    fast_axis=Rinv * matrix.col(p.get_fast_axis()),
-                    slow_axis=Rinv * matrix.col(p.get_slow_axis()),
-                    origin=Rinv * matrix.col(p.get_origin()),
-                )
+        else:
+            _rotate_panels(detector, Rinv)
 
     # Lab coord of desired beam centre
     if us0.accute_angle(n, deg=True) > 89.9:
@@ -228,26 +251,23 @@ def set_slow_fast_beam_centre_mm(detector, beam, beam_centre, panel_id=None):
     intersection_lab = matrix.col(panel.get_lab_coord((beam_f, beam_s)))
 
     # If the detector has a hierarchy, just update the root note
-    try:
-        h = detector.hierarchy()
+    if h is not None:
         translation = beam_centre_lab - intersection_lab
         new_origin = matrix.col(h.get_origin()) + translation
         h.set_frame(
             fast_axis=h.get_fast_axis(), slow_axis=h.get_slow_axis(), origin=new_origin
         )
-    except AttributeError:
+    else:
         # No hierarchy, update each panel instead by finding the offset of
         # its origin from the current position of the desired beam centre. Use
         # this to reposition the panel origin wrt the final beam centre
-        for p in detector:
-            origin = matrix.col(p.get_origin())
-            offset = origin - intersection_lab
-            new_origin = beam_centre_lab + offset
-            p.set_frame(
-                fast_axis=p.get_fast_axis(),
-                slow_axis=p.get_slow_axis(),
-                origin=new_origin,
-            )
+        origins, fasts, slows, _ = _panel_arrays(detector)
+        offsets = origins - np.array(intersection_lab.elems)
+        new_origins = np.array(beam_centre_lab.elems) + offsets
+        for p, fast, slow, new_origin in zip(
+            detector, fasts.tolist(), slows.tolist(), new_origins.tolist()
+        ):
+            p.set_frame(fast_axis=fast, slow_axis=slow, origin=new_origin)
 
     # sanity check to make sure we have got the new beam centre correct
     new_beam_centre = detector[panel_id].get_bidirectional_ray_intersection(us0)
@@ -255,20 +275,14 @@ def set_slow_fast_beam_centre_mm(detector, beam, beam_centre, panel_id=None):
 
     # Re-apply 2theta shift if required
     if two_theta:
-        try:
-            h = detector.hierarchy()
+        if h is not None:
             h.set_frame(
                 fast_axis=R * matrix.col(h.get_fast_axis()),
                 slow_axis=R * matrix.col(h.get_slow_axis()),
                 origin=R * matrix.col(h.get_origin()),
             )
-        except AttributeError:
-            for p in detector:
-                p.set_frame(
-                    fast_axis=R * matrix.col(p.get_fast_axis()),
-                    slow_axis=R * matrix.col(p.get_slow_axis()),
-                    origin=R * matrix.col(p.get_origin()),
-                )
+        else:
+            _rotate_panels(detector, R)
 
     return
 
@@ -287,14 +301,40 @@ def set_detector_distance(detector, distance):
     Set detector origin from distance along normal
     """
     assert len(detector) == 1
-    normal = matrix.col(detector[0].get_normal())
-    origin = matrix.col(detector[0].get_origin())
-    d = origin.dot(normal)
-    x = origin - d * normal
+    panel = detector[0]
+    normal = matrix.col(panel.get_normal())
+    origin = matrix.col(panel.get_origin())
+    x = origin - origin.dot(normal) * normal
     origin = distance * normal + x
-    fast_axis = detector[0].get_fast_axis()
-    slow_axis = detector[0].get_slow_axis()
-    detector[0].set_frame(fast_axis, slow_axis, origin)
+    panel.set_frame(panel.get_fast_axis(), panel.get_slow_axis(), origin)
+
+
+def _panel_arrays(detector):
+    """
+    Extract the origins, fast axes, slow axes and image sizes in mm of all
+    panels as (N, 3), (N, 3), (N, 3) and (N, 2) arrays respectively.
+    """
+    origins = np.array([panel.get_origin() for panel in detector])
+    fasts = np.array([panel.get_fast_axis() for panel in detector])
+    slows = np.array([panel.get_slow_axis() for panel in detector])
+    sizes = np.array([panel.get_image_size_mm() for panel in detector])
+    return origins, fasts, slows, sizes
+
+
+def _rotate_panels(detector, rotation):
+    """
+    Apply a rotation matrix to the frames of all panels of a detector.
+    """
+    origins, fasts, slows, _ = _panel_arrays(detector)
+    # Rotate row vectors by post-multiplying with the transposed matrix
+    rotation_t = np.array(rotation.elems).reshape(3, 3).T
+    for panel, fast, slow, origin in zip(
+        detector,
+        np.matmul(fasts, rotation_t).tolist(),
+        np.matmul(slows, rotation_t).tolist(),
+        np.matmul(origins, rotation_t).tolist(),
+    ):
+        panel.set_frame(fast_axis=fast, slow_axis=slow, origin=origin)
 
 
 def project_2d(detector):
@@ -302,75 +342,71 @@ def project_2d(detector):
     Project panel origin, fast and slow onto the best-fitting 2D plane.
     """
 
-    # Extract panel vertices
-    vertices = []
-    for panel in detector:
-        origin = matrix.col(panel.get_origin())
-        fast = matrix.col(panel.get_fast_axis())
-        slow = matrix.col(panel.get_slow_axis())
-        panel_size = panel.get_image_size_mm()
-        point1 = origin + panel_size[0] * fast
-        point2 = origin + panel_size[1] * slow
-        point3 = origin + panel_size[0] * fast + panel_size[1] * slow
-        vertices.append(origin)
-        vertices.append(point1)
-        vertices.append(point2)
-        vertices.append(point3)
-
-    # Fit a plane by SVD. Modified from https://stackoverflow.com/a/18968498
-    points = np.array(vertices).transpose()
-    centre = points.mean(axis=1)
+    # Extract panel vertices as a (4N, 3) array, with the four corners of each
+    # panel in the order origin, origin + fast, origin + slow and the far corner
+    origins, fasts, slows, sizes = _panel_arrays(detector)
+    vertices = np.empty((len(detector), 4, 3))
+    vertices[:, 0] = origins
+    vertices[:, 1] = origins + sizes[:, 0:1] * fasts
+    vertices[:, 2] = origins + sizes[:, 1:2] * slows
+    vertices[:, 3] = vertices[:, 1] + sizes[:, 1:2] * slows
+    vertices = vertices.reshape(-1, 3)
+
+    # Fit a plane to the vertices. The normal is the eigenvector of the
+    # (symmetric) inertia tensor with the smallest eigenvalue. Modified from
+    # https://stackoverflow.com/a/18968498
+    points = vertices.transpose()
+    centre = vertices.mean(axis=0)
     r = points - centre[:, np.newaxis]  # centroid-to-vertex vectors
     inertia_tensor = np.matmul(r, r.T)
-    u = np.linalg.svd(inertia_tensor)[0]
-    normal = matrix.col(u[:, 2].tolist()).normalize()
-    sum_vertices = matrix.col((0, 0, 0))
-    for v in vertices:
-        sum_vertices += v
-    if normal.dot(sum_vertices) > 0:
-        normal *= -1.0
+    _, eigenvectors = np.linalg.eigh(inertia_tensor)
+    normal = eigenvectors[:, 0]
+    if np.dot(normal, points.sum(axis=1)) > 0:
+        normal = -normal
+    normal = matrix.col(normal.tolist())
 
     # For multi-panel detectors cluster fast, slow axes by DBSCAN to get a
     # consensus X, Y for the 2D plane
     clustered_axes = False
     if sklearn and len(detector) > 1:
         clustered_axes = True
-        axes = []
-        for panel in detector:
-            axes.append(panel.get_fast_axis())
-            axes.append(panel.get_slow_axis())
+        axes = np.empty((2 * len(detector), 3))
+        axes[0::2] = fasts
+        axes[1::2] = slows
         clusters = sklearn.cluster.DBSCAN(eps=0.1, min_samples=2).fit_predict(axes)
-        nclusters = max(clusters) + 1
+        nclusters = clusters.max() + 1
 
         # Revert to single panel mode if clustering is unsucessful
         if nclusters < 2:
             clustered_axes = False
 
     if clustered_axes:
-        summed_axes = [matrix.col((0, 0, 0)) for i in range(nclusters)]
-        for axis, cluster in zip(axes, clusters):
-            summed_axes[cluster] += matrix.col(axis)
-
-        # Combine any two clusters approximately related by inversion
-        all_checked = False
-        while not all_checked:
-            all_checked = True
-            for i, j in itertools.combinations(range(len(summed_axes)), r=2):
-                angle = summed_axes[i].angle(summed_axes[j], deg=True)
-                if 175 < angle < 185:
-                    summed_axes[i] = summed_axes[i] - summed_axes[j]
-                    summed_axes = [e for k, e in enumerate(summed_axes) if k != j]
-                    all_checked = False
-                    break
-        axes = summed_axes
+        # Sum the axes in each cluster. Any labelled as noise (-1) are added to
+        # the last cluster, as negative indices wrap around.
+        summed_axes = np.zeros((nclusters, 3))
+        np.add.at(summed_axes, clusters, axes)
+
+        # Combine clusters approximately related by inversion, i.e. with an
+        # angle of more than 175 degrees between them. Pairs are visited in
+        # order and j is folded into i unless either was already merged away,
+        # so one kept cluster may absorb several others
+        unit_axes = summed_axes / np.linalg.norm(summed_axes, axis=1, keepdims=True)
+        cos_angles = np.matmul(unit_axes, unit_axes.T)
+        inverted = np.triu(cos_angles < math.cos(math.radians(175)), k=1)
+        keep = np.ones(nclusters, dtype=bool)
+        for i, j in np.argwhere(inverted).tolist():
+            if keep[i] and keep[j]:
+                summed_axes[i] -= summed_axes[j]
+                keep[j] = False
+        axes = [matrix.col(e) for e in summed_axes[keep].tolist()]
     # For detectors with few panels or badly misaligned panels, align the
     # plane using the corners of the detector
     else:
-        # Find the 4 points furthest from the centre (the detector corners)
-        dists = np.linalg.norm(r, axis=0)
-        threshold = sorted(dists)[-4]
-        corners = np.where(dists >= threshold)[0].tolist()
-        corners = [vertices[e] for e in corners]
+        # Find the 4 points furthest from the centre (the detector corners).
+        # Squared distances sort the same way, so skip the square roots
+        sq_dists = np.einsum("ij,ij->j", r, r)
+        corners = np.sort(np.argpartition(sq_dists, -4)[-4:])
+        corners = [matrix.col(e) for e in vertices[corners].tolist()]
 
         # Extract two spanning axes from these
         axes = [e - corners[0] for e in corners[1:]]
@@ -389,18 +425,13 @@ def project_2d(detector):
     X = Y.cross(normal).normalize()
 
     # Project centre-shifted origins and fast, slow axes to the plane.
-    origin_2d = []
-    fast_2d = []
-    slow_2d = []
-    centre = matrix.col(centre)
-    for panel in detector:
-        origin = matrix.col(panel.get_origin())
-        centre_to_origin = origin - centre
-        fast = matrix.col(panel.get_fast_axis())
-        slow = matrix.col(panel.get_slow_axis())
-
-        origin_2d.append((centre_to_origin.dot(X), centre_to_origin.dot(Y)))
-        fast_2d.append((fast.dot(X), fast.dot(Y)))
-        slow_2d.append((slow.dot(X), slow.dot(Y)))
-
-    return origin_2d, fast_2d, slow_2d
+    XY = np.column_stack((X.elems, Y.elems))
+    origin_2d = np.matmul(origins - centre, XY)
+    fast_2d = np.matmul(fasts, XY)
+    slow_2d = np.matmul(slows, XY)
+
+    return (
+        [tuple(e) for e in origin_2d.tolist()],
+        [tuple(e) for e in fast_2d.tolist()],
+        [tuple(e) for e in slow_2d.tolist()],
+    )
@@ -13,7 +13,11 @@ from scitbx import matrix
 from scitbx.array_family import flex
 
 from dxtbx.model import Beam, Detector, Panel, ParallaxCorrectedPxMmStrategy
-from dxtbx.model.detector_helpers import project_2d, set_mosflm_beam_centre
+from dxtbx.model.detector_helpers import (
+    project_2d,
+    set_mosflm_beam_centre,
+    set_slow_fast_beam_centre_mm,
+)
 
 
 def create_detector(offset):
@@ -222,6 +226,51 @@ def test_set_mosflm_beam_centre(detector):
     assert d_min1 < d_min2
 
 
+def test_set_slow_fast_beam_centre_mm_without_hierarchy():
+    # A plain list of panels has no hierarchy, so each panel is moved in turn.
+    # The result should match moving the root of an equivalent hierarchy.
+    reference = create_multipanel_detector(offset=0)
+    detector = create_multipanel_detector(offset=0)
+    panels = list(detector)
+
+    beam = Beam(-matrix.col(reference[0].get_normal()), 1.0)
+    beam_centre = matrix.col(reference[0].get_beam_centre(beam.get_s0()))
+
+    def check_frames():
+        for p1, p2 in zip(reference, panels):
+            assert approx_equal(p1.get_origin(), p2.get_origin())
+            assert approx_equal(p1.get_fast_axis(), p2.get_fast_axis())
+            assert approx_equal(p1.get_slow_axis(), p2.get_slow_axis())
+
+    # Re-centre without a 2theta offset
+    slow_fast = tuple(reversed(beam_centre + matrix.col((1, 0.5))))
+    set_slow_fast_beam_centre_mm(reference, beam, slow_fast, panel_id=0)
+    set_slow_fast_beam_centre_mm(panels, beam, slow_fast, panel_id=0)
+    check_frames()
+
+    # Apply a 2theta offset, which is undone and re-applied around the
+    # re-centring
+    R = matrix.col((1, 0, 0)).axis_and_angle_as_r3_rotation_matrix(30, deg=True)
+    h = reference.hierarchy()
+    h.set_frame(
+        R * matrix.col(h.get_fast_axis()),
+        R * matrix.col(h.get_slow_axis()),
+        R * matrix.col(h.get_origin()),
+    )
+    for p in panels:
+        p.set_frame(
+            R * matrix.col(p.get_fast_axis()),
+            R * matrix.col(p.get_slow_axis()),
+            R * matrix.col(p.get_origin()),
+        )
+    check_frames()
+
+    slow_fast = tuple(reversed(beam_centre + matrix.col((-2, 1.5))))
+    set_slow_fast_beam_centre_mm(reference, beam, slow_fast, panel_id=0)
+    set_slow_fast_beam_centre_mm(panels, beam, slow_fast, panel_id=0)
+    check_frames()
+
+
 def test_panel_mask():
     panel = Panel()
     panel.set_image_size((100, 100))
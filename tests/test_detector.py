@@ -42,3 +42,42 @@ def test_detector():
 
     assert DetectorFactory.imgCIF(image, "CCD")
     # x = DetectorFactory.XDS(xparm)
+
+
+def test_detector_imgCIF_array_intensities(tmpdir):
+    dxtbx_dir = libtbx.env.dist_path("dxtbx")
+    image = os.path.join(dxtbx_dir, "tests", "phi_scan_001.cbf")
+
+    detector = DetectorFactory.imgCIF(image, "PAD")
+    assert detector[0].get_trusted_range() == (-1.0, 1541621.0)
+    assert detector[0].get_gain() == 1.0
+
+    # Remove the gain and undefined_value columns from array_intensities
+    with open(image, "rb") as fh:
+        data = fh.read()
+    intensities = b"\r\n".join(
+        (
+            b"_array_intensities.gain",
+            b"_array_intensities.gain_esd",
+            b"_array_intensities.overload",
+            b"_array_intensities.undefined_value",
+            b"ARRAY1 1 linear 1.0 . 1541621 -1",
+        )
+    )
+    assert intensities in data
+    data = data.replace(
+        intensities,
+        b"\r\n".join(
+            (
+                b"_array_intensities.gain_esd",
+                b"_array_intensities.overload",
+                b"ARRAY1 1 linear . 1541621",
+            )
+        ),
+    )
+    stripped = tmpdir.join("stripped.cbf")
+    stripped.write_binary(data)
+
+    detector = DetectorFactory.imgCIF(stripped.strpath, "PAD")
+    assert detector[0].get_trusted_range() == (0.0, 1.0e6)
+    assert detector[0].get_gain() == 1.0
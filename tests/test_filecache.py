@@ -20,18 +20,17 @@ def test_filecache():
     # Create a caching object
     cache = dxtbx.filecache.lazy_file_cache(open(image, "rb"))
 
+    # Compare against slices of the reference data without copying them
+    correct_view = memoryview(correct_data)
+
     # read 100 bytes
-    sh = io.BytesIO(correct_data)
     with cache.open() as fh:
         actual = fh.read(100)
-        expected = sh.read(100)
-        assert actual == expected
+        assert actual == correct_view[:100]
         actual = fh.read(0)
-        expected = sh.read(0)
-        assert actual == expected
+        assert actual == b""
         actual = fh.read(5000)
-        expected = sh.read(5000)
-        assert actual == expected
+        assert actual == correct_view[100:5100]
 
     # readlines
     sh = io.BytesIO(correct_data)
@@ -118,3 +117,89 @@ def test_read_termination_at_end_of_file(tmpdir):
     with cache.open() as fh:
         for record in fh:
             assert record, "Loop should have terminated already"
+
+
+def test_readinto(tmpdir):
+    testfile = tmpdir.join("test")
+    correct_data = bytes(bytearray(range(256))) * 40
+    testfile.write_binary(correct_data)
+
+    cache = dxtbx.filecache.lazy_file_cache(testfile.open("rb"))
+    cache._page_size = 5
+    with cache.open() as fh:
+        buffer = bytearray(100)
+        assert fh.readinto(buffer) == 100
+        assert buffer == correct_data[:100]
+        assert fh.tell() == 100
+        assert fh.read(10) == correct_data[100:110]
+
+        buffer = bytearray(20000)
+        assert fh.readinto(buffer) == len(correct_data) - 110
+        assert buffer[: len(correct_data) - 110] == correct_data[110:]
+        assert fh.readinto(buffer) == 0
+
+
+def test_readline_terminates_beyond_cache_limit(tmpdir):
+    # A bounded readline of a file shorter than a page, with a cache limit
+    # below the file size, used to loop forever
+    testfile = tmpdir.join("test")
+    testfile.write_binary(b"x")
+    cache = dxtbx.filecache.lazy_file_cache(testfile.open("rb"))
+    cache._page_size = 5
+    cache._cache_limit = 2
+    with cache.open() as fh:
+        assert fh.readline(6) == b"x"
+        assert fh.readline(6) == b""
+
+
+def test_reads_reaching_end_of_file_and_cache_limit(tmpdir):
+    # Reaching the end of the file can also set the cache limit flag, when the
+    # limit is not a multiple of the page size. Reads must not then be passed
+    # through to the closed file
+    testfile = tmpdir.join("test")
+    testfile.write_binary(b"x")
+    for method in ("read", "readinto"):
+        cache = dxtbx.filecache.lazy_file_cache(testfile.open("rb"))
+        cache._page_size = 5
+        cache._cache_limit = 1
+        with cache.open() as fh:
+            if method == "read":
+                assert fh.read(181) == b"x"
+            else:
+                buffer = bytearray(181)
+                assert fh.readinto(buffer) == 1
+                assert buffer[:1] == b"x"
+            assert fh.tell() == 1
+
+
+def test_reads_beyond_cache_limit(tmpdir):
+    testfile = tmpdir.join("test")
+    correct_data = b"".join(b"%d %s\n" % (n, b"x" * (n % 37)) for n in range(500))
+    testfile.write_binary(correct_data)
+
+    for page_size in (5, 4096):
+        # Reads which cross the cache limit are passed through to the file
+        cache = dxtbx.filecache.lazy_file_cache(testfile.open("rb"))
+        cache._page_size = page_size
+        cache._cache_limit = 1000
+        sh = io.BytesIO(correct_data)
+        with cache.open() as fh:
+            actual = [fh.readline() for n in range(40)]
+            expected = [sh.readline() for n in range(40)]
+            assert actual == expected
+            assert fh.read(3000) == sh.read(3000)
+            assert [fh.readline(7) for n in range(5)] == [
+                sh.readline(7) for n in range(5)
+            ]
+            assert fh.tell() == sh.tell()
+
+            buffer, expected_buffer = bytearray(500), bytearray(500)
+            assert fh.readinto(buffer) == sh.readinto(expected_buffer)
+            assert buffer == expected_buffer
+
+            fh.seek(990)
+            sh.seek(990)
+            assert fh.readline() == sh.readline()
+            assert fh.readlines() == sh.readlines()
+            assert fh.read(1) == b""
+        cache.close()